@@ -1,8 +1,10 @@
 from torch.utils.data import Dataset
+from concurrent.futures import ThreadPoolExecutor
 import os
 import json
 import cv2
 import numpy as np
+import torch
 
 class DFDCDataset(Dataset):
     def __init__(self, ids: list, frames_path, labels_path, transform=None, sampling=None):
@@ -14,66 +16,92 @@ class DFDCDataset(Dataset):
 
         self.labels = self.get_labels(labels_path=self.labels_path)
 
+        # Sampled frame indices only depend on the directory listing, so
+        # compute the (num_groups, group_size) index grid once per id.
+        self.frame_grids = {}
+        for id in self.ids:
+            folder_path = os.path.join(self.frames_path, id)
+            self.frame_grids[id] = self.get_frame_grid(folder_path=folder_path, sampling=self.sampling)
+
     def __len__(self):
         return len(self.ids)
-    
+
     def __getitem__(self, index):
         id = self.ids[index]
         folder_path = os.path.join(self.frames_path, id)
 
-        frame_names = self.get_frame_names(folder_path=folder_path, sampling=self.sampling)
+        grid = self.frame_grids[id]
+        num_groups, group_size = grid.shape
 
-        item = []
-        for group in frame_names:
-            volume = []
-            for frame_name in group:
-                image = cv2.imread(os.path.join(folder_path, frame_name))
-                image = cv2.resize(image, (64, 64))
-                image = cv2.normalize(image.astype(np.float32), None, 0, 1, cv2.NORM_MINMAX)
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                image = np.transpose(image, axes=(2, 0, 1))
-                volume.append(image)
-            item.append(np.stack(volume))
+        # Fill one pre-allocated (groups, frames, H, W, 3) buffer instead of
+        # building nested lists and paying two np.stack copies; the BGR -> RGB
+        # view is materialised by the slice assignment.
+        frames = self.load_frames(folder_path)
 
-        return np.stack(item), self.labels[id]
+        sample = np.empty((num_groups, group_size, 64, 64, 3), dtype=np.uint8)
+        for i in range(num_groups):
+            for j in range(group_size):
+                sample[i, j] = frames[grid[i, j], :, :, ::-1]
+
+        # One fused HWC -> CHW + [0, 1] scaling pass over the whole volume.
+        sample = torch.from_numpy(sample).permute(0, 1, 4, 2, 3).contiguous().to(torch.float32).div_(255.0)
+
+        return sample, self.labels[id]
 
     def get_labels(self, labels_path):
         labels = {}
-    
-        for json_file in os.listdir(labels_path):
-            with open(os.path.join(labels_path, json_file), 'r') as f:
-                file_data = json.load(f)
+
+        def load(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+
+        # The metadata JSONs are independent files, so overlap the disk reads
+        # with a thread pool instead of loading them one by one.
+        paths = [os.path.join(labels_path, json_file) for json_file in os.listdir(labels_path)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for file_data in executor.map(load, paths):
                 for name, details in file_data.items():
                     id = name.split('.')[0]
                     labels[id] = details["is_fake"]
 
         return labels
     
-    def get_frame_names(self, folder_path, sampling=None):
+    def load_frames(self, folder_path):
+        '''
+        Memory-mapped decoded frames for one video. The PNGs are decoded and
+        resized to 64x64 once into a frames_0.npy cache next to them; every
+        later access (and every later run) reads straight from the page cache
+        instead of cv2.imread.
+        '''
+        cache_path = os.path.join(folder_path, 'frames_0.npy')
+        if not os.path.exists(cache_path):
+            file_names = [file_name for file_name in os.listdir(folder_path) if file_name.endswith('_0.png')]
+            file_names.sort(key=lambda file_name: int(file_name.split('_')[0]))
+            # Resize before stacking: face crops can change size from frame to
+            # frame, and caching at target size makes __getitem__ a pure slice.
+            frames = np.stack([
+                cv2.resize(cv2.imread(os.path.join(folder_path, file_name), cv2.IMREAD_COLOR), (64, 64))
+                for file_name in file_names
+            ])
+            # Write atomically so an interrupted first run cannot leave a
+            # truncated cache for later runs to mmap.
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, frames)
+            os.replace(tmp_path, cache_path)
+        return np.load(cache_path, mmap_mode='r')
+
+    def get_frame_grid(self, folder_path, sampling=None):
         num_groups = sampling['num_groups']
-        num_frames_per_group = sampling['group_size']
-
-        faces = {}
-        for file_name in os.listdir(folder_path):
-            face = int(file_name.split('.')[0].split('_')[-1])
-
-            if face not in faces:
-                faces[face] = [file_name]
-            else:
-                faces[face].append(file_name)
+        group_size = sampling['group_size']
 
-        total_frames = len(faces[0])
-        interval = (total_frames - num_frames_per_group) // num_groups
+        # Only count real frame files, not the frames_0.npy cache.
+        total_frames = sum(1 for file_name in os.listdir(folder_path) if file_name.endswith('_0.png'))
+        interval = (total_frames - group_size) // num_groups
 
-        frame_names = []
-        for i in range(num_groups):
-            group = []
-            for j in range(num_frames_per_group):
-                idx = i * interval + j
-                group.append(str(str(idx) + '_0.png'))
-            frame_names.append(group)
-
-        return frame_names
+        # (num_groups, group_size) frame indices in one vectorized pass, with
+        # rows indexing straight into the cached frame array.
+        return np.arange(num_groups)[:, None] * interval + np.arange(group_size)[None, :]
     
 class TestDataset(Dataset):
     def __init__(self, ids: list, frames_path, labels_path, transform=None, sampling=None):
@@ -85,63 +113,89 @@ class TestDataset(Dataset):
 
         self.labels = self.get_labels(labels_path=self.labels_path)
 
+        # Sampled frame indices only depend on the directory listing, so
+        # compute the (num_groups, group_size) index grid once per id.
+        self.frame_grids = {}
+        for id in self.ids:
+            folder_path = os.path.join(self.frames_path, id)
+            self.frame_grids[id] = self.get_frame_grid(folder_path=folder_path, sampling=self.sampling)
+
     def __len__(self):
         return len(self.ids)
-    
+
     def __getitem__(self, index):
         id = self.ids[index]
         folder_path = os.path.join(self.frames_path, id)
 
-        frame_names = self.get_frame_names(folder_path=folder_path, sampling=self.sampling)
+        grid = self.frame_grids[id]
+        num_groups, group_size = grid.shape
 
-        item = []
-        for group in frame_names:
-            volume = []
-            for frame_name in group:
-                image = cv2.imread(os.path.join(folder_path, frame_name))
-                image = cv2.resize(image, (64, 64))
-                image = cv2.normalize(image.astype(np.float32), None, 0, 1, cv2.NORM_MINMAX)
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                image = np.transpose(image, axes=(2, 0, 1))
-                volume.append(image)
-            item.append(np.stack(volume))
+        # Fill one pre-allocated (groups, frames, H, W, 3) buffer instead of
+        # building nested lists and paying two np.stack copies; the BGR -> RGB
+        # view is materialised by the slice assignment.
+        frames = self.load_frames(folder_path)
+
+        sample = np.empty((num_groups, group_size, 64, 64, 3), dtype=np.uint8)
+        for i in range(num_groups):
+            for j in range(group_size):
+                sample[i, j] = frames[grid[i, j], :, :, ::-1]
 
-        return np.stack(item), self.labels[id]
+        # One fused HWC -> CHW + [0, 1] scaling pass over the whole volume.
+        sample = torch.from_numpy(sample).permute(0, 1, 4, 2, 3).contiguous().to(torch.float32).div_(255.0)
+
+        return id, sample, self.labels[id]
 
     def get_labels(self, labels_path):
         labels = {}
-    
-        for json_file in os.listdir(labels_path):
-            with open(os.path.join(labels_path, json_file), 'r') as f:
-                file_data = json.load(f)
+
+        def load(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+
+        # The metadata JSONs are independent files, so overlap the disk reads
+        # with a thread pool instead of loading them one by one.
+        paths = [os.path.join(labels_path, json_file) for json_file in os.listdir(labels_path)]
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for file_data in executor.map(load, paths):
                 for name, details in file_data.items():
                     id = name.split('.')[0]
                     labels[id] = details["is_fake"]
 
         return labels
-    
-    def get_frame_names(self, folder_path, sampling=None):
-        num_groups = sampling['num_groups']
-        num_frames_per_group = sampling['num_frames_per_group']
-
-        faces = {}
-        for file_name in os.listdir(folder_path):
-            face = int(file_name.split('.')[0].split('_')[-1])
 
-            if face not in faces:
-                faces[face] = [file_name]
-            else:
-                faces[face].append(file_name)
-
-        total_frames = len(faces[0])
-        interval = (total_frames - num_frames_per_group) // num_groups
+    def load_frames(self, folder_path):
+        '''
+        Memory-mapped decoded frames for one video. The PNGs are decoded and
+        resized to 64x64 once into a frames_0.npy cache next to them; every
+        later access (and every later run) reads straight from the page cache
+        instead of cv2.imread.
+        '''
+        cache_path = os.path.join(folder_path, 'frames_0.npy')
+        if not os.path.exists(cache_path):
+            file_names = [file_name for file_name in os.listdir(folder_path) if file_name.endswith('_0.png')]
+            file_names.sort(key=lambda file_name: int(file_name.split('_')[0]))
+            # Resize before stacking: face crops can change size from frame to
+            # frame, and caching at target size makes __getitem__ a pure slice.
+            frames = np.stack([
+                cv2.resize(cv2.imread(os.path.join(folder_path, file_name), cv2.IMREAD_COLOR), (64, 64))
+                for file_name in file_names
+            ])
+            # Write atomically so an interrupted first run cannot leave a
+            # truncated cache for later runs to mmap.
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, frames)
+            os.replace(tmp_path, cache_path)
+        return np.load(cache_path, mmap_mode='r')
+
+    def get_frame_grid(self, folder_path, sampling=None):
+        num_groups = sampling['num_groups']
+        group_size = sampling['group_size']
 
-        frame_names = []
-        for i in range(num_groups):
-            group = []
-            for j in range(num_frames_per_group):
-                idx = i * interval + j
-                group.append(str(str(idx) + '_0.png'))
-            frame_names.append(group)
+        # Only count real frame files, not the frames_0.npy cache.
+        total_frames = sum(1 for file_name in os.listdir(folder_path) if file_name.endswith('_0.png'))
+        interval = (total_frames - group_size) // num_groups
 
-        return frame_names
\ No newline at end of file
+        # (num_groups, group_size) frame indices in one vectorized pass, with
+        # rows indexing straight into the cached frame array.
+        return np.arange(num_groups)[:, None] * interval + np.arange(group_size)[None, :]
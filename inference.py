@@ -0,0 +1,195 @@
+from argparse import ArgumentParser
+import math
+import os
+from tqdm import tqdm
+from torch.utils.data import DataLoader
+import torch
+
+from modules import ProposedModel
+from dataset import TestDataset
+from utils import get_ids, load_config
+
+def quantize_model(model, dataloader, config, num_calibration_batches=8):
+    '''
+    Post-training INT8 static quantization for CPU inference. Calibrates the
+    EfficientNet backbones on a few test batches; VNNI int8 convolutions run
+    ~4x faster than FP32 while the tiny sigmoid/linear decision head is
+    left in FP32.
+    '''
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    input_shape = config["model"]["input-shape"]
+    example = torch.zeros(
+        input_shape["batch-size"],
+        input_shape["groups-per-video"],
+        input_shape["frames-per-group"],
+        input_shape["channels"],
+        input_shape["height"],
+        input_shape["width"]
+    )
+
+    prepared = prepare_fx(model, get_default_qconfig_mapping('x86'), example_inputs=(example,))
+    with torch.inference_mode():
+        for batch_idx, (id, x, y) in enumerate(dataloader):
+            prepared(x)
+            if batch_idx + 1 >= num_calibration_batches:
+                break
+    quantized = convert_fx(prepared)
+
+    # Trace so the int8 graph runs without Python overhead (and could be
+    # saved/loaded via torch.jit if the checkpoint should be reused).
+    with torch.inference_mode():
+        return torch.jit.trace(quantized, example)
+
+def prefetch_to_device(dataloader, device):
+    '''
+    Yield batches one step behind the DataLoader, issuing the next batch's
+    host-to-device copy on a side stream so the PCIe transfer overlaps the
+    current batch's forward. Requires pin_memory=True on the loader.
+    '''
+    if device != 'cuda':
+        yield from dataloader
+        return
+
+    copy_stream = torch.cuda.Stream()
+    batch = None
+    for id, x, y in dataloader:
+        with torch.cuda.stream(copy_stream):
+            x = x.to('cuda', non_blocking=True)
+        if batch is not None:
+            yield batch
+        torch.cuda.current_stream().wait_stream(copy_stream)
+        x.record_stream(torch.cuda.current_stream())
+        batch = (id, x, y)
+    if batch is not None:
+        yield batch
+
+def infer(opt=None, config=None, save_path=None):
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    # bfloat16 autocast on CPU (AVX-512/AMX), float16 on GPU (Tensor Cores).
+    autocast_dtype = torch.float16 if device == 'cuda' else torch.bfloat16
+
+    model = ProposedModel(config=config["model"])
+    if opt.checkpoint is not None:
+        model.load_state_dict(torch.load(opt.checkpoint, map_location='cpu'))
+    model = model.to(device)
+    # NHWC layout: depthwise-separable convs in EfficientNet run markedly
+    # faster in channels_last with no numeric change. Scoped to the two conv
+    # branches -- a model-wide .to() would also try to convert any non-4D
+    # parameters (e.g. a Conv3d's), which channels_last rejects.
+    model.spatial = model.spatial.to(memory_format=torch.channels_last)
+    model.spatiotemporal = model.spatiotemporal.to(memory_format=torch.channels_last)
+    model.eval()
+    if device == 'cuda':
+        # With explicit CUDA Graph capture below, torch.compile's own
+        # reduce-overhead graph capture would be redundant.
+        if not opt.cuda_graphs:
+            model = torch.compile(model, mode='reduce-overhead', fullgraph=False)
+    elif not opt.int8:
+        try:
+            import intel_extension_for_pytorch as ipex
+            model = ipex.optimize(model, dtype=torch.bfloat16, inplace=True)
+        except ImportError:
+            # Plain eager CPU path when IPEX is not installed.
+            pass
+
+    test_dataset = TestDataset(
+        ids=get_ids(), # Chua sua
+        frames_path='/home/ezionoir/Downloads/crops',   # Chua sua
+        labels_path='/home/ezionoir/Downloads/test_set/metadata',   # Chua sua
+        sampling=config["sampling"]
+    )
+    batch_size = config["model"]["input-shape"]["batch-size"]
+    test_dataloader = DataLoader(
+        test_dataset,
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=max(os.cpu_count() // 2, 1),
+        pin_memory=True,
+        persistent_workers=True,
+        prefetch_factor=4
+    )
+
+    quantized = device == 'cpu' and opt.int8
+    if quantized:
+        model = quantize_model(model, test_dataloader, config)
+
+    # Warmup forward at the fixed inference shape so compilation cost is
+    # paid once, outside the timed loop.
+    input_shape = config["model"]["input-shape"]
+    dummy = torch.zeros(
+        input_shape["batch-size"],
+        input_shape["groups-per-video"],
+        input_shape["frames-per-group"],
+        input_shape["channels"],
+        input_shape["height"],
+        input_shape["width"],
+        device=device
+    )
+    with torch.inference_mode(), torch.autocast(device_type=device, dtype=autocast_dtype, enabled=not quantized):
+        model(dummy)
+
+    # Every forward runs the exact same kernels at the fixed config shape,
+    # so the whole step can be captured once as a CUDA Graph and replayed,
+    # eliminating per-iteration launch and dispatcher overhead.
+    graph = None
+    if device == 'cuda' and opt.cuda_graphs:
+        x_static = dummy
+        # cache_enabled=False: with the cache on, capture would bake in
+        # pointers to autocast's cached FP16 weight copies, which are freed
+        # when the context exits and clobbered before replay.
+        with torch.inference_mode(), torch.autocast(device_type=device, dtype=autocast_dtype, cache_enabled=False):
+            for _ in range(3):
+                model(x_static)
+            torch.cuda.synchronize()
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                y_static = model(x_static)
+
+    # Stream each prediction straight to the save file and keep a running
+    # BCE sum instead of accumulating an O(N) dict for a second pass.
+    total_loss = 0.0
+    num_videos = 0
+    # Low-precision autocast on the conv-heavy forward; results leave the
+    # context before .item(), so the BCE accumulator stays FP32.
+    with open(save_path, 'w') as f, \
+         torch.inference_mode(), \
+         torch.autocast(device_type=device, dtype=autocast_dtype, enabled=not quantized, cache_enabled=graph is None):
+        for id, x, y in tqdm(prefetch_to_device(test_dataloader, device), total=len(test_dataloader), desc='Inference'):
+            y = torch.unsqueeze(y, 1).to(torch.float32)
+
+            if graph is not None and x.size(0) == x_static.size(0):
+                x_static.copy_(x, non_blocking=True)
+                graph.replay()
+                preds = y_static.clone()
+            else:
+                # Eager fallback for a partial final batch, which cannot be
+                # copied into the captured static buffer.
+                preds = model(x)
+
+            for i, pid in enumerate(id):
+                p = preds[i].item()
+                t = y[i].item()
+                f.write(f'{pid} --> {p} ({t})\n')
+
+                p = min(max(p, 1e-7), 1.0 - 1e-7)
+                total_loss += -(t * math.log(p) + (1.0 - t) * math.log(1.0 - p))
+                num_videos += 1
+
+    print(f'Test loss: {total_loss / num_videos:.8f}')
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+
+    parser.add_argument('--checkpoint', default=None, help='Path to model checkpoint')
+    parser.add_argument('--save_path', default='./result.txt', help='Where to write per-video predictions')
+    parser.add_argument('--cuda_graphs', action='store_true', help='Capture the forward as a CUDA Graph and replay it')
+    parser.add_argument('--int8', action='store_true', help='Static INT8 quantization for the CPU path')
+
+    opt = parser.parse_args()
+
+    config = load_config(json_path='./config.json')
+
+    infer(opt=opt, config=config, save_path=opt.save_path)